@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import argparse
+import logging
 
 from lib.integrator import Integrator
+from lib.s2_writer import file_extensions
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -20,5 +22,14 @@ if __name__ == "__main__":
         nargs="?",
         default=True,
     )
+    parser.add_argument(
+        "--format",
+        help=f"The format to write the RDF in. Options are {', '.join(sorted(file_extensions))}",
+        type=str,
+        nargs="?",
+        choices=sorted(file_extensions),
+        default="ttl",
+    )
     args = parser.parse_args()
-    Integrator(args.compressed, args.path)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    Integrator(args.compressed, args.path, args.format)
@@ -0,0 +1,86 @@
+# Arithmetic on the 64 bit integer form of s2 cell IDs. The level of a cell is
+# encoded by the position of its lowest set bit, so levels and ancestors can be
+# computed without constructing S2CellId objects.
+
+from typing import Generator
+
+import numpy as np
+
+MAX_LEVEL = 30
+
+
+def lsb_for_level(level: int) -> int:
+    """
+    Returns the lowest set bit of the IDs of the cells at a level
+
+    Args:
+        level: An s2 level
+    Returns:
+        The lowest set bit as an integer
+    """
+    return 1 << (2 * (MAX_LEVEL - level))
+
+
+def cell_level(cell_id_int: int) -> int:
+    """
+    Returns the level of a cell from its ID
+
+    Args:
+        cell_id_int: The integer ID of a valid s2 cell
+    Returns:
+        The level of the cell
+    """
+    lsb = cell_id_int & -cell_id_int
+    return MAX_LEVEL - (lsb.bit_length() - 1) // 2
+
+
+def cell_parent(cell_id_int: int, level: int) -> int:
+    """
+    Returns the ID of the ancestor of a cell at a coarser level
+
+    Args:
+        cell_id_int: The integer ID of a valid s2 cell
+        level: The level of the ancestor, at most the level of the cell
+    Returns:
+        The integer ID of the ancestor
+    """
+    lsb = lsb_for_level(level)
+    return (cell_id_int & -lsb) | lsb
+
+
+def generate_cell_ranges(
+    level: int, batch_size: int
+) -> Generator[tuple[int, int], None, None]:
+    """
+    Yields the positions of the cells of a level in ID order, as half open
+    (start, stop) ranges of at most batch_size cells
+
+    Args:
+        level: An s2 level
+        batch_size: Maximal number of cells in a range
+    Returns:
+        A generator of (start, stop) tuples
+    """
+    num_cells = 6 * 4**level
+    for start in range(0, num_cells, batch_size):
+        yield start, min(start + batch_size, num_cells)
+
+
+def cell_ids_in_range(level: int, start: int, stop: int) -> np.ndarray:
+    """
+    Returns the IDs of the cells of a level between two positions. The cells
+    of a level are evenly spaced in ID space across all six faces, starting
+    from the first cell of face 0, so the IDs are computed as an arithmetic
+    range instead of walking the cells with S2CellId.next()
+
+    Args:
+        level: An s2 level
+        start: Position of the first cell
+        stop: Position after the last cell
+    Returns:
+        A uint64 array of cell IDs
+    """
+    lsb = lsb_for_level(level)
+    begin = np.uint64(lsb)
+    step = np.uint64(lsb << 1)
+    return begin + np.arange(start, stop, dtype=np.uint64) * step
@@ -1,19 +1,33 @@
+import logging
+import math
 import os
-from functools import partial
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from multiprocessing import get_context
 from pathlib import Path
-from typing import Generator
+from typing import Generator, Iterable
 
+import numpy as np
 from rdflib import Graph, URIRef
-from rdflib.query import ResultRow
+from rdflib.namespace import GEO
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
+from rdflib.term import Node
 from s2geometry import (S2Cell, S2CellId, S2LatLng, S2Loop, S2Point, S2Polygon,
                         S2Polyline, S2RegionCoverer)
-from shapely import (LinearRing, LineString, MultiLineString, MultiPolygon,
-                     Point, Polygon, buffer)
+from shapely import (LinearRing, LineString, MultiLineString, MultiPoint,
+                     MultiPolygon, Point, Polygon, buffer, from_wkb, from_wkt,
+                     get_coordinates, to_wkb)
 from shapely.geometry.polygon import signed_area
-from shapely.wkt import loads
 
 from .config import config
-from .kwg_ont import KWGOnt, generate_cell_iri
+from .kwg_ont import KWGOnt, cell_iri_from_id
+
+logger = logging.getLogger(__name__)
+
+# Cell budget for interior coverings. S2 stops well short of it once the
+# filling is saturated, so a single GetInteriorCovering call is enough.
+MAX_FILLING_CELLS = 10**8
 
 
 class GeometricFeature:
@@ -21,9 +35,13 @@ class GeometricFeature:
     Represents an abstract geometric feature with an IRI
     """
 
-    def __init__(self, query_solution: ResultRow) -> None:
-        self.iri = query_solution["feature_iri"]
-        self.geometry = loads(query_solution["wkt"])
+    def __init__(self, iri: URIRef, geometry: bytes | str) -> None:
+        self.iri = iri
+        # WKB when the record was parsed ahead of time, WKT otherwise
+        if isinstance(geometry, bytes):
+            self.geometry = from_wkb(geometry)
+        else:
+            self.geometry = from_wkt(geometry)
 
     def geometry(self):
         return self.geometry
@@ -41,16 +59,26 @@ class GeometricFeature:
         Yields:
             Generator[S2CellId, None, None]: a generator through the overlapping IDs
         """
-        homogeneous_coverer = S2RegionCoverer()
-        homogeneous_coverer.set_min_level(config.min_level)
-        homogeneous_coverer.set_max_level(config.max_level)
+        homogeneous_coverer = get_coverer(config.min_level, config.max_level)
+        # When the buffer would be far thinner than a cell, its covering is
+        # essentially that of the rings themselves; cover those as polylines.
+        thin_buffer = math.radians(tolerance / 100) < average_edge(config.max_level)
+        # Each ring is covered on its own and the cell IDs are merged, which
+        # is far cheaper than a GEOS union of the buffered rings.
+        cell_ids = set()
         for boundary in self.boundaries(geometry):
-            segmented_boundary = boundary.segmentize(tolerance)
-            buff = buffer(segmented_boundary, tolerance / 100, 2)
-            for cell_id in self.covering(
-                buff, coverer=homogeneous_coverer, tolerance=tolerance
-            ):
-                yield cell_id
+            segmentized = boundary.segmentize(tolerance)
+            if thin_buffer:
+                polyline = S2Polyline()
+                polyline.InitFromS2Points(s2_points(segmentized))
+                covering = homogeneous_coverer.GetCovering(polyline)
+            else:
+                buff = buffer(segmentized, tolerance / 100, 2)
+                covering = self.covering(buff, homogeneous_coverer, tolerance=tolerance)
+            for cell_id in covering:
+                if cell_id.id() not in cell_ids:
+                    cell_ids.add(cell_id.id())
+                    yield cell_id
 
     def yield_crossing_ids(
         self,
@@ -70,9 +98,7 @@ class GeometricFeature:
         Yields:
             Generator[S2CellId, None, None]: a generator of crossing cell IDs
         """
-        homogeneous_coverer = S2RegionCoverer()
-        homogeneous_coverer.set_min_level(config.min)
-        homogeneous_coverer.set_max_level(config.max_level)
+        homogeneous_coverer = get_coverer(config.min_level, config.max_level)
         buff = buffer(line_obj, tolerance / 100, 2)
         for cell_id in self.covering(buff, homogeneous_coverer, tolerance=tolerance):
             yield cell_id
@@ -83,26 +109,39 @@ class GeometricFeature:
         if isinstance(self.geometry, (Polygon, MultiPolygon)):
             predicate = KWGOnt.sfContains
             inverse = KWGOnt.sfWithin
-            for cell_id in self.filling(self.geometry, coverer, tolerance):
-                yield self.iri, predicate, generate_cell_iri(cell_id)
-                yield generate_cell_iri(cell_id), inverse, self.iri
+            filling = self.filling(self.geometry, coverer, tolerance)
+            interior_ids = cell_id_array(filling)
+            for cell_id_int in interior_ids.tolist():
+                cell_iri = cell_iri_from_id(cell_id_int)
+                yield self.iri, predicate, cell_iri
+                yield cell_iri, inverse, self.iri
 
             predicate = KWGOnt.sfOverlaps
-            for cell_id in self.yield_overlapping_ids(self.geometry, tolerance):
-                yield self.iri, predicate, generate_cell_iri(cell_id)
-                yield generate_cell_iri(cell_id), predicate, self.iri
+            overlapping = self.yield_overlapping_ids(self.geometry, tolerance)
+            # cells in the filling are already related by sfContains
+            overlapping_ids = np.setdiff1d(
+                cell_id_array(overlapping), interior_ids, assume_unique=True
+            )
+            for cell_id_int in overlapping_ids.tolist():
+                cell_iri = cell_iri_from_id(cell_id_int)
+                yield self.iri, predicate, cell_iri
+                yield cell_iri, predicate, self.iri
 
         elif isinstance(self.geometry, (LineString, MultiLineString)):
             predicate = KWGOnt.sfCrosses
-            for cell_id in self.yield_crossing_ids(self.geometry, tolerance):
-                yield self.iri, predicate, generate_cell_iri(cell_id)
-                yield generate_cell_iri(cell_id), predicate, self.iri
+            crossing = self.yield_crossing_ids(self.geometry, tolerance)
+            for cell_id_int in cell_id_array(crossing).tolist():
+                cell_iri = cell_iri_from_id(cell_id_int)
+                yield self.iri, predicate, cell_iri
+                yield cell_iri, predicate, self.iri
 
         elif isinstance(self.geometry, Point):
-            s2_point = self.s2_from_coords(self.geometry)
-            cell_id = S2CellId(s2_point).parent(config.max_level)
-            yield self.iri, KWGOnt.sfWithin, generate_cell_iri(cell_id)
-            yield generate_cell_iri(cell_id), KWGOnt.sfContains, self.iri
+            # a point sits in exactly one cell per level, so no coverer is needed
+            cell_ids = point_cell_ids(self.geometry, config.max_level)
+            for cell_id_int in cell_ids.tolist():
+                cell_iri = cell_iri_from_id(cell_id_int)
+                yield self.iri, KWGOnt.sfWithin, cell_iri
+                yield cell_iri, KWGOnt.sfContains, self.iri
 
         else:
             geom_type = self.geometry.geom_type
@@ -154,25 +193,33 @@ class GeometricFeature:
         Returns:
             S2Point | S2Loop | S2Polyline | S2Polygon: an S2 geometric object
         """
-        if isinstance(geometry, tuple):
-            return S2LatLng.FromDegrees(*geometry[::-1]).ToPoint()
-        elif isinstance(geometry, Point):
-            return S2LatLng.FromDegrees(*geometry.coords[0][::-1]).ToPoint()
-        elif isinstance(geometry, LinearRing):
-            s2_loop = S2Loop()
-            s2_loop.Init(list(map(self.s2_from_coords, list(geometry.coords)[:-1])))
-            return s2_loop
-        elif isinstance(geometry, LineString):
-            polyline = S2Polyline()
-            polyline.InitFromS2Points(list(map(self.s2_from_coords, geometry.coords)))
-            return polyline
-        elif isinstance(geometry, (Polygon, MultiPolygon)):
-            loops = map(
-                self.s2_from_coords, map(self.orient, self.boundaries(geometry))
-            )
-            s2_polygon = S2Polygon()
-            s2_polygon.InitNested(list(loops))
-            return s2_polygon
+        converter = S2_CONVERTERS.get(type(geometry))
+        if converter is None:
+            geom_type = type(geometry).__name__
+            raise ValueError(f"Geometry of type {geom_type} has no S2 counterpart")
+        return converter(self, geometry)
+
+    def _s2_from_tuple(self, coords: tuple) -> S2Point:
+        return S2LatLng.FromDegrees(*coords[::-1]).ToPoint()
+
+    def _s2_from_point(self, point: Point) -> S2Point:
+        return S2LatLng.FromDegrees(*point.coords[0][::-1]).ToPoint()
+
+    def _s2_from_ring(self, ring: LinearRing) -> S2Loop:
+        s2_loop = S2Loop()
+        s2_loop.Init(s2_points(ring)[:-1])
+        return s2_loop
+
+    def _s2_from_line(self, line: LineString) -> S2Polyline:
+        polyline = S2Polyline()
+        polyline.InitFromS2Points(s2_points(line))
+        return polyline
+
+    def _s2_from_polygon(self, polygon: Polygon | MultiPolygon) -> S2Polygon:
+        loops = map(self._s2_from_ring, map(self.orient, self.boundaries(polygon)))
+        s2_polygon = S2Polygon()
+        s2_polygon.InitNested(list(loops))
+        return s2_polygon
 
     def s2_approximation(
         self,
@@ -247,50 +294,268 @@ class GeometricFeature:
         """
         Returns a list of cell IDs that constitute a filling
         of a 2-dimensional geometry that is saturated to the 13th level
-        within a certain value of tolerance
+        within a certain value of tolerance.
+
+        With a coverer whose min_level is below its max_level (compressed
+        mode) the filling mixes levels: each cell is the largest one that
+        fits in the geometry, the same set as merging complete sibling
+        groups of the max_level filling into their parents. Every level is
+        therefore produced by the one GetInteriorCovering call.
 
         Args:
             polygon (Polygon | MultiPolygon): a 2-dimensional geometry
-            coverer (S2RegionCoverer):
+            coverer (S2RegionCoverer): a coverer bounding the cell levels
             tolerance (float, optional): maximal segment width. Defaults to 1e-2.
 
         Returns:
             list[S2CellId]: a list of s2 cell IDs in a saturated fill
         """
-        filling = []
         s2_obj = self.s2_approximation(polygon, tolerance)
-        for exponent in range(4, 9):
-            max_cells = 10**exponent
-            coverer.set_max_cells(max_cells)
-            filling = coverer.GetInteriorCovering(s2_obj)
-            num_cells = len(filling)
-            if num_cells < 10 ** (exponent - 1):
-                break  # iterate until the filling is saturated
+        # The coverer may be shared through get_coverer, so its budget is put
+        # back once the filling is done
+        original_max_cells = coverer.max_cells()
+        max_cells = MAX_FILLING_CELLS
+        try:
+            while True:
+                coverer.set_max_cells(max_cells)
+                filling = coverer.GetInteriorCovering(s2_obj)
+                if len(filling) < max_cells:
+                    break  # the filling is saturated
+                max_cells *= 10
+        finally:
+            coverer.set_max_cells(original_max_cells)
         return filling
 
 
+def cell_id_array(cell_ids: Iterable[S2CellId]) -> np.ndarray:
+    """
+    Returns the sorted, distinct 64 bit IDs of the given cells
+    Args:
+        cell_ids (Iterable[S2CellId]): a collection of cell IDs
+    Returns:
+        np.ndarray: a uint64 array of cell IDs
+    """
+    ids = np.fromiter((cell_id.id() for cell_id in cell_ids), dtype=np.uint64)
+    return np.unique(ids)
+
+
+def point_cell_ids(geometry: Point | MultiPoint, level: int) -> np.ndarray:
+    """
+    Returns the IDs of the cells at a level that contain the given points.
+    All coordinates are read in one call and each point goes straight to
+    its leaf cell, whose ancestor at the level is a bit operation.
+    Args:
+        geometry (Point | MultiPoint): a 0-dimensional geometry
+        level (int): the level of the returned cells
+    Returns:
+        np.ndarray: a sorted uint64 array of distinct cell IDs
+    """
+    from_degrees = S2LatLng.FromDegrees
+    return cell_id_array(
+        S2CellId(from_degrees(lat, lng).ToPoint()).parent(level)
+        for lng, lat in get_coordinates(geometry).tolist()
+    )
+
+
+# s2_from_coords dispatches on the exact type; it runs for every ring of every feature
+S2_CONVERTERS = {
+    tuple: GeometricFeature._s2_from_tuple,
+    Point: GeometricFeature._s2_from_point,
+    LinearRing: GeometricFeature._s2_from_ring,
+    LineString: GeometricFeature._s2_from_line,
+    Polygon: GeometricFeature._s2_from_polygon,
+    MultiPolygon: GeometricFeature._s2_from_polygon,
+}
+
+
+@lru_cache(maxsize=8)
+def get_coverer(min_level: int, max_level: int, max_cells: int = 8) -> S2RegionCoverer:
+    """
+    Returns a region coverer with the given options. Coverers are reused
+    for the lifetime of the process instead of being rebuilt per feature;
+    callers must not change the options of the returned coverer, other
+    than the max_cells adjustments made by GeometricFeature.filling.
+    Args:
+        min_level (int): the coarsest level of the cells in a covering
+        max_level (int): the finest level of the cells in a covering
+        max_cells (int, optional): the cell budget of a covering. Defaults to 8.
+    Returns:
+        S2RegionCoverer: a configured region coverer
+    """
+    coverer = S2RegionCoverer()
+    coverer.set_min_level(min_level)
+    coverer.set_max_level(max_level)
+    coverer.set_max_cells(max_cells)
+    return coverer
+
+
+def average_edge(level: int) -> float:
+    """
+    Returns the typical edge length of the cells at a level
+    Args:
+        level (int): an s2 level
+    Returns:
+        float: an angle in radians
+    """
+    return math.sqrt(S2Cell.AverageArea(level))
+
+
+def s2_points(geometry: LinearRing | LineString) -> list[S2Point]:
+    """
+    Returns the vertices of a ring or line string as S2 points. The
+    coordinates are pulled out of GEOS in one call rather than vertex by
+    vertex, leaving only the S2 conversion in the Python loop.
+    Args:
+        geometry (LinearRing | LineString): a one-dimensional geometry
+    Returns:
+        list[S2Point]: the vertices on the sphere, in order
+    """
+    from_degrees = S2LatLng.FromDegrees
+    return [
+        from_degrees(lat, lng).ToPoint()
+        for lng, lat in get_coordinates(geometry).tolist()
+    ]
+
+
 def yield_geometric_features(path: Path) -> Generator[GeometricFeature, None, None]:
+    for iri, geometry in yield_feature_records(path):
+        yield GeometricFeature(iri, geometry)
+
+
+def yield_feature_records(
+    path: Path,
+) -> Generator[tuple[URIRef, bytes | str], None, None]:
+    """
+    Yields the raw (feature IRI, geometry) pairs found in the graph data at
+    path. These are cheap to pickle, so they can be handed to worker
+    processes which then build the GeometricFeature themselves.
+
+    The files of a directory are read in parallel, and their geometries are
+    converted to WKB by the reading processes. A single file is read by the
+    caller, so its WKT is passed on as is and parsed by the workers instead.
+
+    Args:
+        path (Path): a file or a directory hosting graphical data
+
+    Yields:
+        Generator[tuple[URIRef, bytes | str], None, None]: (IRI, WKB or WKT) pairs
+    """
     if os.path.isfile(path):
-        graph = Graph()
-        with open(path, "r") as read_stream:
-            graph.parse(read_stream)
-        result = graph.query(
-            """
-            PREFIX geo: <http://www.opengis.net/ont/geosparql#>
-            SELECT ?feature_iri ?wkt 
-            WHERE {
-                ?feature_iri geo:hasGeometry ?geometry .
-                ?geometry geo:asWKT ?wkt .
-            }
-            """
-        )
-        for query_solution in result:
-            geometric_feature = GeometricFeature(query_solution)
-            yield geometric_feature
+        for record in read_feature_records(path):
+            yield record
     elif os.path.isdir(path):
-        for file_path in yield_file_paths(path):
-            for feature in yield_geometric_features(file_path):
-                yield feature
+        # The records are consumed from a thread of the integration pool, so
+        # the parser processes must not be forked from the parent.
+        context = get_context("forkserver")
+        max_workers = os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers, mp_context=context) as executor:
+            # Keep a bounded window of files in flight, so parsed records
+            # can't pile up faster than the integration pool consumes them.
+            pending = deque()
+            for file_path in yield_file_paths(path):
+                pending.append(executor.submit(read_binary_feature_records, file_path))
+                if len(pending) < 2 * max_workers:
+                    continue
+                for record in pending.popleft().result():
+                    yield record
+            while pending:
+                for record in pending.popleft().result():
+                    yield record
+
+
+def read_binary_feature_records(path: Path) -> list[tuple[URIRef, bytes]]:
+    """
+    Returns the (feature IRI, WKB) pairs in a single file. The WKT literals
+    are parsed in one vectorized call, so that workers only have to read
+    the much cheaper binary form.
+
+    Args:
+        path (Path): a file hosting graphical data
+
+    Returns:
+        list[tuple[URIRef, bytes]]: the (IRI, WKB) pairs in the file
+    """
+    records = read_feature_records(path)
+    if not records:
+        return []
+    iris, wkts = zip(*records)
+    wkbs = to_wkb(from_wkt(list(wkts)), output_dimension=2)
+    return list(zip(iris, wkbs.tolist()))
+
+
+def read_feature_records(path: Path) -> list[tuple[URIRef, str]]:
+    """
+    Returns the (feature IRI, WKT) pairs in a single file. N-Triples files
+    are scanned line by line, keeping only the geo:hasGeometry and geo:asWKT
+    statements; other formats are loaded into a Graph and queried.
+
+    Args:
+        path (Path): a file hosting graphical data
+
+    Returns:
+        list[tuple[URIRef, str]]: the (IRI, WKT) pairs in the file
+    """
+    logger.debug("Parsing file %s", path)
+    if Path(path).suffix == ".nt":
+        sink = GeometrySink()
+        with open(path, "rb") as read_stream:
+            W3CNTriplesParser(sink=sink).parse(read_stream)
+        return sink.records()
+    return query_feature_records(path)
+
+
+def query_feature_records(path: Path) -> list[tuple[URIRef, str]]:
+    """
+    Returns the (feature IRI, WKT) pairs in a single file by loading it
+    into a Graph and querying it
+
+    Args:
+        path (Path): a file hosting graphical data
+
+    Returns:
+        list[tuple[URIRef, str]]: the (IRI, WKT) pairs in the file
+    """
+    graph = Graph()
+    with open(path, "r") as read_stream:
+        graph.parse(read_stream)
+    result = graph.query(
+        """
+        PREFIX geo: <http://www.opengis.net/ont/geosparql#>
+        SELECT ?feature_iri ?wkt 
+        WHERE {
+            ?feature_iri geo:hasGeometry ?geometry .
+            ?geometry geo:asWKT ?wkt .
+        }
+        """
+    )
+    return [
+        (query_solution["feature_iri"], str(query_solution["wkt"]))
+        for query_solution in result
+    ]
+
+
+class GeometrySink:
+    """
+    An N-Triples parser sink that only retains the statements linking
+    features to their WKT serializations
+    """
+
+    def __init__(self) -> None:
+        self.geometries = []
+        self.wkts = {}
+
+    def triple(self, s: Node, p: Node, o: Node) -> None:
+        if p == GEO.hasGeometry:
+            self.geometries.append((s, o))
+        elif p == GEO.asWKT:
+            self.wkts[s] = str(o)
+
+    def records(self) -> list[tuple[URIRef, str]]:
+        return [
+            (feature_iri, self.wkts[geometry])
+            for feature_iri, geometry in self.geometries
+            if geometry in self.wkts
+        ]
 
 
 def yield_file_paths(input_dir: Path) -> Generator[Path, None, None]:
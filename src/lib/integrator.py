@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+import logging
 import os
 from functools import partial
 from multiprocessing import Pool
 from pathlib import Path
 
-from s2geometry import S2CellId, S2RegionCoverer
+from rdflib import URIRef
+from s2geometry import S2CellId
 from shapely.geometry import MultiPolygon, Polygon
 
 from .config import config
-from .geometric_feature import GeometricFeature, yield_geometric_features
-from .kwg_ont import namespace_prefix
+from .geometric_feature import (MAX_FILLING_CELLS, GeometricFeature,
+                                get_coverer, yield_feature_records)
+from .s2_writer import S2Writer, file_extensions
+
+logger = logging.getLogger(__name__)
+
+# Number of features handed to a worker at a time. Features vary wildly in
+# cost, so keep this small enough that one large polygon can't starve the pool.
+FEATURE_CHUNKSIZE = 8
 
 
 class Integrator:
@@ -18,15 +27,16 @@ class Integrator:
     Abstraction over the process for integrating s2 cells together with spatial relations.
     """
 
-    def __init__(self, compressed: bool, folder: str | Path):
+    def __init__(self, compressed: bool, folder: str | Path, rdf_format: str = "ttl"):
         """
         Creates a new Integrator
 
         :param compressed: Whether the triples are compressed or not
         :param folder: Path to the folder where the triples are
+        :param rdf_format: Format of the RDF written. Depends on the formats rdflib supports
         """
         if compressed:
-            print(
+            logger.info(
                 "Compression is on. Relations will be compressed using the S2 hierarchy..."
             )
         data_path = Path(folder)
@@ -41,12 +51,15 @@ class Integrator:
             self.write_all_relations,
             output_folder=output_folder,
             is_compressed=compressed,
+            rdf_format=rdf_format,
         )
 
+        records = enumerate(yield_feature_records(data_path))
         with Pool() as pool:
-            pool.map(write, enumerate(yield_geometric_features(data_path)))
+            for _ in pool.imap_unordered(write, records, chunksize=FEATURE_CHUNKSIZE):
+                pass
 
-        print(f"Done! \nRelations written in path '{output_folder}'.")
+        logger.info("Done! \nRelations written in path '%s'.", output_folder)
 
     @staticmethod
     def homogeneous_covering(
@@ -54,31 +67,35 @@ class Integrator:
         level: int,
         tolerance: float = config.tolerance,
     ) -> list[S2CellId]:
-        homogeneous_coverer = S2RegionCoverer()
-        homogeneous_coverer.set_min_level(level)
-        homogeneous_coverer.set_max_level(level)
+        homogeneous_coverer = get_coverer(level, level)
         return GeometricFeature().covering(
             geometry=geometry, coverer=homogeneous_coverer, tolerance=tolerance
         )
 
     @staticmethod
     def write_all_relations(
-        indexed_feature: tuple[int, GeometricFeature],
+        indexed_record: tuple[int, tuple[URIRef, bytes | str]],
         output_folder: str,
         is_compressed: bool,
+        rdf_format: str = "ttl",
         tolerance: float = config.tolerance,
     ) -> None:
-        idx, feature = indexed_feature
-        coverer = S2RegionCoverer()
-        coverer.set_max_level(config.max_level)
-        if not is_compressed:
-            coverer.set_min_level(config.min_level)
-        else:
-            coverer.set_min_level(0)
-        graph = feature.s2_graph(coverer, tolerance=tolerance)
-        if graph:
-            for pfx in namespace_prefix:
-                graph.bind(pfx, namespace_prefix[pfx])
-            file_name = f"{idx}.ttl"
-            destination = os.path.join(output_folder, file_name)
-            graph.serialize(destination=destination, format="ttl")
+        """
+        Writes the s2 relations of a single feature to its own file. Runs
+        inside a worker process, so the geometry is parsed here rather than
+        in the parent.
+
+        :param indexed_record: The index of the feature and its (IRI, WKB or WKT) pair
+        :param output_folder: Path to the folder where the triples are written
+        :param is_compressed: Whether the triples are compressed or not
+        :param rdf_format: Format of the RDF written
+        :param tolerance: Maximal segment width
+        """
+        idx, (iri, geometry) = indexed_record
+        feature = GeometricFeature(iri, geometry)
+        min_level = 0 if is_compressed else config.min_level
+        coverer = get_coverer(min_level, config.max_level, MAX_FILLING_CELLS)
+        file_name = f"{idx}{file_extensions[rdf_format]}"
+        destination = os.path.join(output_folder, file_name)
+        with S2Writer(destination, rdf_format) as writer:
+            writer.add_all(feature.yield_s2_relations(coverer, tolerance=tolerance))
@@ -1,7 +1,11 @@
-from rdflib import RDF, RDFS, XSD, URIRef
+from functools import lru_cache
+
+from rdflib import RDF, RDFS, XSD, Graph, URIRef
 from rdflib.namespace import DefinedNamespace, Namespace
 from s2geometry import S2Cell, S2CellId
 
+from .cell_ids import cell_level
+
 
 class KWGOnt(DefinedNamespace):
     kwg_endpoint = "http://stko-kwg.geog.ucsb.edu/"
@@ -36,6 +40,10 @@ class KWGOnt(DefinedNamespace):
     _NS = Namespace(f"{kwg_endpoint}lod/ontology/")
 
 
+# Common start of every cell IRI, formatted once instead of through Namespace lookups
+CELL_IRI_PREFIX = f"{KWGOnt.KWGR}s2.level"
+
+
 def generate_cell_iri(cell_id: S2CellId) -> URIRef:
     """
     Creates an IRI for an individual cell, with a KnowWhereGraph domain
@@ -45,9 +53,21 @@ def generate_cell_iri(cell_id: S2CellId) -> URIRef:
     Returns:
          A URI of the s2 cell
     """
-    level = cell_id.level()
-    id_str = cell_id.id()
-    return KWGOnt.KWGR[f"{'s2.level'}{level}.{id_str}"]
+    return cell_iri_from_id(cell_id.id())
+
+
+@lru_cache(maxsize=1 << 20)
+def cell_iri_from_id(cell_id_int: int) -> URIRef:
+    """
+    Creates the IRI of a cell from its 64 bit ID. S2CellId objects aren't
+    hashable by value, so the cache is keyed on the integer ID instead.
+
+    Args:
+        cell_id_int: The integer ID of the s2 cell
+    Returns:
+         A URI of the s2 cell
+    """
+    return URIRef(f"{CELL_IRI_PREFIX}{cell_level(cell_id_int)}.{cell_id_int}")
 
 
 namespace_prefix = {
@@ -59,3 +79,16 @@ namespace_prefix = {
     "rdfs": RDFS,
     "xsd": XSD,
 }
+
+
+def get_graph() -> Graph:
+    """
+    Creates an empty graph with the KnowWhereGraph prefixes bound
+
+    Returns:
+        A graph ready to be serialized with short prefixed names
+    """
+    graph = Graph()
+    for pfx in namespace_prefix:
+        graph.bind(pfx, namespace_prefix[pfx])
+    return graph
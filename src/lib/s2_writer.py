@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable
+
+from rdflib.term import Literal, Node, URIRef
+
+from .kwg_ont import get_graph, namespace_prefix
+
+file_extensions = {
+    "ttl": ".ttl",
+    "turtle": ".ttl",
+    "xml": ".xml",
+    "nq": ".nq",
+    "n3": ".n3",
+    "nt": ".nt",
+    "trix": ".trix",
+    "trig": ".trig",
+    "nquads": ".nq",
+    "json-ld": ".jsonld",
+}
+
+# Formats for which a file of N-Triples lines is a valid document
+STREAMABLE_FORMATS = {"nt", "ttl", "turtle", "n3", "nq", "nquads"}
+
+# Streamable formats whose files start with @prefix directives, so that
+# IRIs can be written as prefixed names
+TURTLE_FORMATS = {"ttl", "turtle", "n3"}
+
+TURTLE_PREFIXES = [(pfx, str(namespace)) for pfx, namespace in namespace_prefix.items()]
+
+TURTLE_HEADER = "".join(
+    f"@prefix {pfx}: <{namespace}> .\n" for pfx, namespace in TURTLE_PREFIXES
+).encode("utf-8")
+
+# Local names that are valid in Turtle without any escaping
+LOCAL_NAME = re.compile(r"[A-Za-z0-9_](?:[A-Za-z0-9_.-]*[A-Za-z0-9_-])?")
+
+
+@lru_cache(maxsize=1 << 16)
+def encode_term(term: Node) -> bytes:
+    """
+    Returns the N-Triples form of an RDF term as bytes. Feature IRIs and
+    predicates repeat on every line, so these are cached.
+
+    Args:
+        term: An RDF term
+    Returns:
+        The encoded term
+    """
+    return term.n3().encode("utf-8")
+
+
+def prefixed_name(iri: URIRef) -> str | None:
+    """
+    Returns an IRI as a prefixed name using the KnowWhereGraph prefixes
+
+    Args:
+        iri: An IRI
+    Returns:
+        The prefixed name, or None if no prefix gives a valid local name
+    """
+    for pfx, namespace in TURTLE_PREFIXES:
+        if iri.startswith(namespace):
+            local_name = iri[len(namespace) :]
+            if LOCAL_NAME.fullmatch(local_name):
+                return f"{pfx}:{local_name}"
+    return None
+
+
+@lru_cache(maxsize=1 << 16)
+def encode_turtle_term(term: Node) -> bytes:
+    """
+    Returns the Turtle form of an RDF term as bytes. IRIs, and the datatypes
+    of literals, are shortened to prefixed names where possible; every other
+    term is written as in N-Triples.
+
+    Args:
+        term: An RDF term
+    Returns:
+        The encoded term
+    """
+    if isinstance(term, URIRef):
+        name = prefixed_name(term)
+        if name is not None:
+            return name.encode("utf-8")
+    elif isinstance(term, Literal) and term.datatype is not None:
+        n3 = term.n3()
+        suffix = f"^^{term.datatype.n3()}"
+        name = prefixed_name(term.datatype)
+        if name is not None and n3.endswith(suffix):
+            return f"{n3[: -len(suffix)]}^^{name}".encode("utf-8")
+    return encode_term(term)
+
+
+class S2Writer:
+    """
+    Writes triples to a single RDF file. Line based formats are streamed
+    straight to disk, one N-Triples line per triple; the remaining formats
+    are collected into an rdflib Graph and serialized on close. Turtle
+    files get a fixed @prefix header, so that their lines can use prefixed
+    names without the serializer having to look at the whole graph.
+    The file is only created once the first triple is added.
+    """
+
+    def __init__(self, destination: str | Path, rdf_format: str = "ttl") -> None:
+        """
+        Creates a new S2Writer
+
+        :param destination: Path of the file being written
+        :param rdf_format: Format of the RDF. Depends on the formats rdflib supports
+        """
+        self.destination = destination
+        self.rdf_format = rdf_format
+        self.stream = None
+        self.graph = None
+        self.encode = encode_term
+        if rdf_format in TURTLE_FORMATS:
+            self.encode = encode_turtle_term
+        elif rdf_format not in STREAMABLE_FORMATS:
+            self.graph = get_graph()
+
+    def open_stream(self) -> None:
+        """
+        Creates the file, starting it with the prefix directives if any
+        """
+        self.stream = open(self.destination, "wb", buffering=1 << 20)
+        if self.rdf_format in TURTLE_FORMATS:
+            self.stream.write(TURTLE_HEADER)
+
+    def add(self, triple: tuple[Node, Node, Node]) -> None:
+        if self.graph is not None:
+            self.graph.add(triple)
+            return
+        if self.stream is None:
+            self.open_stream()
+        s, p, o = triple
+        encode = self.encode
+        self.stream.write(b"%s %s %s .\n" % (encode(s), encode(p), encode(o)))
+
+    def add_all(self, triples: Iterable[tuple[Node, Node, Node]]) -> None:
+        """
+        Adds every triple of an iterable. The lines are handed to the
+        buffered stream in a single writelines call rather than one write
+        per triple.
+        """
+        if self.graph is not None:
+            for triple in triples:
+                self.graph.add(triple)
+            return
+        encode = self.encode
+        lines = (
+            b"%s %s %s .\n" % (encode(s), encode(p), encode(o)) for s, p, o in triples
+        )
+        first = next(lines, None)
+        if first is None:
+            return
+        if self.stream is None:
+            self.open_stream()
+        self.stream.write(first)
+        self.stream.writelines(lines)
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        elif self.graph:
+            self.graph.serialize(destination=self.destination, format=self.rdf_format)
+
+    def __enter__(self) -> S2Writer:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
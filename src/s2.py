@@ -1,134 +1,224 @@
 from __future__ import annotations
 
 import argparse
+import math
 import os
-from functools import partial
-from multiprocessing import Pool
+from functools import lru_cache, partial
+from multiprocessing import get_context
 from pathlib import Path
+from typing import Generator
 
-from rdflib import RDF, RDFS, XSD, Graph, Literal
+import numpy as np
+from rdflib import RDF, RDFS, XSD, Literal, URIRef
 from rdflib.namespace._GEO import GEO
-from s2geometry import (S2Cell, S2CellId, S2LatLng, S2Loop, S2Point, S2Polygon,
+from rdflib.term import Node
+from s2geometry import (S2Cell, S2CellId, S2Loop, S2Point, S2Polygon,
                         S2Polyline, S2RegionCoverer)
-from shapely.geometry import Polygon
+from shapely import polygons, to_wkt
 
+from lib.cell_ids import cell_ids_in_range, cell_parent, generate_cell_ranges
 from lib.integrator import Integrator
-from lib.kwg_ont import KWGOnt, generate_cell_iri, namespace_prefix
+from lib.kwg_ont import KWGOnt, cell_iri_from_id, namespace_prefix
+from lib.s2_writer import S2Writer, file_extensions
 
+# Number of cells generated, and written to one file, at a time
+CELL_BATCH_SIZE = 10_000
 
-def write_to_rdf(cell_id_int: int, out_path: str, rdf_format: str) -> None:
+# Terms shared by the triples of every cell, built once rather than per cell
+HAS_METRIC_AREA = namespace_prefix["geo"]["hasMetricArea"]
+HAS_DEFAULT_GEOMETRY = namespace_prefix["geo"]["hasDefaultGeometry"]
+SF_POLYGON = namespace_prefix["sf"]["Polygon"]
+
+# Common start of every cell geometry IRI, formatted once like CELL_IRI_PREFIX
+GEOMETRY_IRI_PREFIX = f"{KWGOnt.KWGR}geometry.polygon.s2.level"
+
+DEGREES_PER_RADIAN = 180 / math.pi
+
+# Square of the earth radius in meters, converting areas on the unit sphere
+EARTH_RADIUS_SQUARED = 6.3781e6 * 6.3781e6
+
+
+@lru_cache(maxsize=None)
+def cell_type(level: int) -> URIRef:
+    """
+    Returns the class of the cells at a level, built once per level
+
+    Args
+        level: Level of the cells
+    returns
+        The IRI of the class
+    """
+    return KWGOnt[f"S2Cell_Level{level}"]
+
+
+def write_cell_range(
+    cell_range: tuple[int, int],
+    level: int,
+    out_path: str,
+    rdf_format: str,
+    emit_parent_reverse: bool = True,
+) -> None:
+    """
+    Writes the cells of a level between two positions to disk. Only the
+    range is sent to the worker; the IDs are computed on its side.
+
+    Args
+        cell_range: The (start, stop) positions of the cells
+        level: Level of the cells
+        out_path: The location where the cells will be written
+        rdf_format: Format of the RDF. Depends on the formats rdflib supports
+        emit_parent_reverse: Whether the parents' sfContains edges are written
+    returns
+        None
     """
-    Writes a s2 cell to disk
+    cell_ids = cell_ids_in_range(level, *cell_range)
+    write_to_rdf(cell_ids, out_path, rdf_format, emit_parent_reverse)
+
+
+def write_to_rdf(
+    cell_ids: np.ndarray,
+    out_path: str,
+    rdf_format: str,
+    emit_parent_reverse: bool = True,
+) -> None:
+    """
+    Writes a batch of s2 cells to disk, as a single file named after the
+    first cell in the batch
 
     Args
-        cell_id_int: ID of the cell being written
-        out_path: The location where the cell will be written
+        cell_ids: IDs of the cells being written
+        out_path: The location where the cells will be written
         rdf_format: Format of the RDF. Depends on the formats rdflib supports
+        emit_parent_reverse: Whether the parents' sfContains edges are written
     returns
         None
     """
-    cell_id = S2CellId(cell_id_int)
-    graph = graphify(cell_id)
-    if graph:
-        for pfx in namespace_prefix:
-            graph.bind(pfx, namespace_prefix[pfx])
-        file_extensions = {
-            "ttl": ".ttl",
-            "turtle": ".ttl",
-            "xml": ".xml",
-            "nq": ".nq",
-            "n3": "n3",
-            "nt": ".nt",
-            "trix": ".trix",
-            "trig": ".trig",
-            "nquads": ".nq",
-            "json-ld": ".jsonld",
-        }
-        file_name = str(cell_id.id()) + file_extensions[rdf_format]
-        destination = os.path.join(out_path, file_name)
-        graph.serialize(destination=destination, format=rdf_format)
-
-
-def graphify(cell_id: S2CellId) -> Graph:
-    graph = Graph()
+    if not len(cell_ids):
+        return
+    file_name = str(cell_ids[0]) + file_extensions[rdf_format]
+    destination = os.path.join(out_path, file_name)
+    s2_cell_ids = [S2CellId(cell_id_int) for cell_id_int in cell_ids.tolist()]
+    cells = [S2Cell(cell_id) for cell_id in s2_cell_ids]
+    wkts = to_wkt(build_vertex_polygons(cells), rounding_precision=-1)
+    with S2Writer(destination, rdf_format) as writer:
+        for cell_id, cell, wkt in zip(s2_cell_ids, cells, wkts.tolist()):
+            triples = yield_cell_triples(
+                cell_id, cell=cell, wkt=wkt, emit_parent_reverse=emit_parent_reverse
+            )
+            writer.add_all(triples)
+
 
+def yield_cell_triples(
+    cell_id: S2CellId,
+    cell: S2Cell,
+    wkt: str,
+    emit_parent_reverse: bool = True,
+) -> Generator[tuple[Node, Node, Node], None, None]:
+    """
+    Yields the triples describing a s2 cell: its type, label, ID, area,
+    geometry, neighbors and parent
+
+    Args
+        cell_id: ID of the cell being described
+        cell: The cell itself
+        wkt: WKT of the polygon formed by the vertices of the cell
+        emit_parent_reverse: Whether the sfContains edge from the parent is
+            written along with the sfWithin edge to it. It can be left out
+            when the reverse edges are inferred downstream
+    returns
+        A generator of triples
+    """
     cell_level = cell_id.level()
     id_int = cell_id.id()
 
-    cell_iri = generate_cell_iri(cell_id)
+    cell_iri = cell_iri_from_id(id_int)
     p = RDF.type
-    o = KWGOnt[f"S2Cell_Level{cell_level}"]
-    graph.add((cell_iri, p, o))
+    o = cell_type(cell_level)
+    yield cell_iri, p, o
 
     label = f"S2 Cell at level {cell_level} with ID {id_int}"
     p = RDFS.label
-    o = Literal(label, datatype=XSD.string)
-    graph.add((cell_iri, p, o))
+    o = Literal(label)
+    yield cell_iri, p, o
 
     p = KWGOnt.cellID
     o = Literal(id_int, datatype=XSD.integer)
-    graph.add((cell_iri, p, o))
+    yield cell_iri, p, o
 
-    cell = S2Cell(cell_id)
     area_on_sphere = cell.ApproxArea()
-    area_on_earth = area_on_sphere * 6.3781e6 * 6.3781e6
+    area_on_earth = area_on_sphere * EARTH_RADIUS_SQUARED
 
-    p = namespace_prefix["geo"]["hasMetricArea"]
+    p = HAS_METRIC_AREA
     o = Literal(area_on_earth, datatype=XSD.float)
-    graph.add((cell_iri, p, o))
+    yield cell_iri, p, o
 
-    geometry = get_vertex_polygon(cell=cell)
-    geometry_iri = KWGOnt.KWGR[f"geometry.polygon.s2.level{cell_level}.{id_int}"]
+    geometry_iri = URIRef(f"{GEOMETRY_IRI_PREFIX}{cell_level}.{id_int}")
     p = GEO.hasGeometry
-    graph.add((cell_iri, p, geometry_iri))
+    yield cell_iri, p, geometry_iri
 
-    p = namespace_prefix["geo"]["hasDefaultGeometry"]
-    graph.add((cell_iri, p, geometry_iri))
+    p = HAS_DEFAULT_GEOMETRY
+    yield cell_iri, p, geometry_iri
 
     p = RDF.type
     o = GEO.Geometry
-    graph.add((geometry_iri, p, o))
+    yield geometry_iri, p, o
 
-    o = namespace_prefix["sf"]["Polygon"]
-    graph.add((geometry_iri, p, o))
+    o = SF_POLYGON
+    yield geometry_iri, p, o
 
     label = f"Geometry of the polygon formed from the vertices of the S2 Cell at level {cell_level} with ID {id_int}"
     p = RDFS.label
-    o = Literal(label, datatype=XSD.string)
-    graph.add((geometry_iri, p, o))
+    o = Literal(label)
+    yield geometry_iri, p, o
 
-    wkt = geometry.wkt
     p = GEO.asWKT
     o = Literal(wkt, datatype=GEO.wktLiteral)
-    graph.add((geometry_iri, p, o))
+    yield geometry_iri, p, o
 
+    # Only the edges from this cell are written; every neighbor is generated
+    # at the same level and writes the edges in the other direction itself.
+    # Cells at the corners of a cube face get some neighbors more than once
     neighbors = cell_id.GetAllNeighbors(cell_level)
-    for neighbor in neighbors:
+    for neighbor_id in dict.fromkeys(neighbor.id() for neighbor in neighbors):
         p = KWGOnt.sfTouches
-        neighbor_iri = generate_cell_iri(neighbor)
-        graph.add((cell_iri, p, neighbor_iri))
-        graph.add((neighbor_iri, p, cell_iri))
+        neighbor_iri = cell_iri_from_id(neighbor_id)
+        yield cell_iri, p, neighbor_iri
 
     if cell_level > 0:
-        parent = cell_id.parent()
-        parent_iri = generate_cell_iri(parent)
+        parent_iri = cell_iri_from_id(cell_parent(id_int, cell_level - 1))
         p = KWGOnt.sfWithin
-        graph.add((cell_iri, p, parent_iri))
+        yield cell_iri, p, parent_iri
 
-        p = KWGOnt.sfContains
-        graph.add((parent_iri, p, cell_iri))
+        if emit_parent_reverse:
+            p = KWGOnt.sfContains
+            yield parent_iri, p, cell_iri
 
-    return graph
 
+def build_vertex_polygons(cells: list[S2Cell]) -> np.ndarray:
+    """
+    Returns the polygons formed by the vertices of many cells. The vertex
+    coordinates are computed from the unit vectors with the same formulas as
+    S2LatLng, without building S2LatLng objects, and written straight into a
+    single array, from which all the polygons are built in one vectorized call
 
-def get_vertex_polygon(cell: S2Cell) -> Polygon:
-    vertices = map(cell.GetVertex, range(4))
-    lat_lngs = [S2LatLng(vertex) for vertex in vertices]
-    coords = [
-        [lat_lng.lng().degrees(), lat_lng.lat().degrees()] for lat_lng in lat_lngs
-    ]
-    vertex_polygon = Polygon(coords)
-    return vertex_polygon
+    Args
+        cells: The cells
+    returns
+        An array of polygons, one per cell
+    """
+    coords = np.empty((len(cells), 5, 2), dtype=np.float64)
+    for i, cell in enumerate(cells):
+        for k in range(4):
+            vertex = cell.GetVertex(k)
+            # adding 0.0 turns -0.0 into 0.0, so that longitudes of 180 degrees
+            # aren't flipped to -180, as in S2LatLng
+            x, y, z = vertex.x() + 0.0, vertex.y() + 0.0, vertex.z()
+            coords[i, k] = (
+                math.atan2(y, x) * DEGREES_PER_RADIAN,
+                math.atan2(z, math.sqrt(x * x + y * y)) * DEGREES_PER_RADIAN,
+            )
+    coords[:, 4] = coords[:, 0]
+    return polygons(coords)
 
 
 if __name__ == "__main__":
@@ -138,12 +228,18 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--format",
-        help="The format to write the RDF in. Options are xml, n3, turtle, nt, pretty-xml, trix, trig, nquads, "
-        "json-ld, hext",
+        help=f"The format to write the RDF in. Options are {', '.join(sorted(file_extensions))}",
         type=str,
         nargs="?",
+        choices=sorted(file_extensions),
         default="ttl",
     )
+    parser.add_argument(
+        "--no-parent-reverse",
+        help="Only write the sfWithin edges from cells to their parents, leaving out the reverse sfContains edges",
+        dest="emit_parent_reverse",
+        action="store_false",
+    )
     args = parser.parse_args()
 
     level = args.level
@@ -152,27 +248,15 @@ if __name__ == "__main__":
     output_path = os.path.join(output_folder, level_path)
     os.makedirs(output_path, exist_ok=True)
 
-    beginning_id = S2CellId.Begin(level=level)
-    ending_id = S2CellId.End(level=level)
-
-    current_id = beginning_id
-    cell_id_integers = []
-    while True:
-        id_as_integer = (
-            current_id.id()
-        )  # note that current_id is an instance of S2CellId
-        cell_id_integers.append(id_as_integer)
-        current_id = current_id.next()
-        if current_id == ending_id:
-            break
-    parents = set()
     print(f"Writing data for cells at level {level}...")
-    write = partial(write_to_rdf, out_path=output_path, rdf_format=args.format)
-    with Pool() as pool:
-        pool.map(write, cell_id_integers)
-    if level > 0:
-        parents = set(
-            S2CellId(cell_id_integer).parent() for cell_id_integer in cell_id_integers
-        )
-        cell_id_integers = [parent.id() for parent in parents]
-        level -= 1
+    write = partial(
+        write_cell_range,
+        level=level,
+        out_path=output_path,
+        rdf_format=args.format,
+        emit_parent_reverse=args.emit_parent_reverse,
+    )
+    with get_context("forkserver").Pool() as pool:
+        cell_ranges = generate_cell_ranges(level, CELL_BATCH_SIZE)
+        for _ in pool.imap_unordered(write, cell_ranges):
+            pass
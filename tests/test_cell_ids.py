@@ -0,0 +1,42 @@
+from s2geometry import S2CellId, S2LatLng
+
+from ..src.lib.cell_ids import (cell_ids_in_range, cell_level, cell_parent,
+                                generate_cell_ranges)
+
+
+def test_cell_level_and_parent():
+    """
+    Tests the bit arithmetic against the s2 library at every level
+
+    :return: None
+    """
+    leaf = S2CellId(S2LatLng.FromDegrees(34.4, -119.7).ToPoint())
+    for level in range(31):
+        cell_id = leaf.parent(level)
+        assert cell_level(cell_id.id()) == level
+        for parent_level in range(level + 1):
+            expected = cell_id.parent(parent_level).id()
+            assert cell_parent(cell_id.id(), parent_level) == expected
+
+
+def test_cell_ranges_match_next_walk():
+    """
+    Tests that the arithmetic batches of cell IDs list the same cells as
+    walking a level with S2CellId.next(), with a batch size that doesn't
+    divide the number of cells
+
+    :return: None
+    """
+    batch_size = 7
+    for level in range(6):
+        expected = []
+        cell_id = S2CellId.Begin(level)
+        end = S2CellId.End(level)
+        while cell_id != end:
+            expected.append(cell_id.id())
+            cell_id = cell_id.next()
+        cell_ids = []
+        for start, stop in generate_cell_ranges(level, batch_size):
+            assert 0 < stop - start <= batch_size
+            cell_ids.extend(cell_ids_in_range(level, start, stop).tolist())
+        assert cell_ids == expected
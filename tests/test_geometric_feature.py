@@ -0,0 +1,59 @@
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.namespace import GEO
+
+from ..src.lib.geometric_feature import (GeometricFeature, get_coverer,
+                                         read_feature_records)
+
+
+def test_nt_scan_matches_query(tmp_path):
+    """
+    Tests that scanning an N-Triples file finds the same features as
+    querying the same graph loaded from turtle
+
+    :return: None
+    """
+    graph = Graph()
+    named = URIRef("http://example.org/feature/named")
+    named_geometry = URIRef("http://example.org/geometry/named")
+    graph.add((named, GEO.hasGeometry, named_geometry))
+    graph.add(
+        (named_geometry, GEO.asWKT, Literal("POINT (1 2)", datatype=GEO.wktLiteral))
+    )
+    blank = URIRef("http://example.org/feature/blank")
+    blank_geometry = BNode()
+    graph.add((blank, GEO.hasGeometry, blank_geometry))
+    graph.add(
+        (
+            blank_geometry,
+            GEO.asWKT,
+            Literal("POLYGON ((0 0, 1 0, 1 1, 0 0))", datatype=GEO.wktLiteral),
+        )
+    )
+    no_wkt = URIRef("http://example.org/feature/no_wkt")
+    graph.add((no_wkt, GEO.hasGeometry, URIRef("http://example.org/geometry/none")))
+
+    graph.serialize(destination=tmp_path / "features.nt", format="nt", encoding="utf-8")
+    graph.serialize(destination=tmp_path / "features.ttl", format="ttl")
+    scanned = read_feature_records(tmp_path / "features.nt")
+    queried = read_feature_records(tmp_path / "features.ttl")
+    assert sorted(scanned) == sorted(queried)
+    assert sorted(scanned) == [
+        (blank, "POLYGON ((0 0, 1 0, 1 1, 0 0))"),
+        (named, "POINT (1 2)"),
+    ]
+
+
+def test_filling_keeps_coverer_budget():
+    """
+    Tests that escalating the cell budget of a filling leaves the shared
+    coverer configured as get_coverer built it
+
+    :return: None
+    """
+    feature = GeometricFeature(
+        URIRef("http://example.org/feature"), "POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))"
+    )
+    coverer = get_coverer(13, 13, 1)
+    filling = feature.filling(feature.geometry, coverer)
+    assert len(filling) > 1
+    assert coverer.max_cells() == 1
@@ -1,7 +1,7 @@
 from rdflib import URIRef
 from s2geometry import S2CellId
 
-from ..src.lib.kwg_ont import generate_cell_iri
+from ..src.lib.kwg_ont import cell_iri_from_id, generate_cell_iri
 
 
 def test_generate_cell_iri():
@@ -15,3 +15,22 @@ def test_generate_cell_iri():
     assert generate_cell_iri(cell_id) == URIRef(
         "http://stko-kwg.geog.ucsb.edu/lod/resource/s2.level1" ".288230376151711744"
     )
+
+
+def test_cell_iri_from_id():
+    """
+    Tests that the integer-keyed IRI has the expected form, including the
+    level derived from the bits of deep cell IDs
+
+    :return: None
+    """
+    prefix = "http://stko-kwg.geog.ucsb.edu/lod/resource/"
+    assert cell_iri_from_id(288230376151711744) == URIRef(
+        f"{prefix}s2.level1.288230376151711744"
+    )
+    assert cell_iri_from_id(9288977748200521728) == URIRef(
+        f"{prefix}s2.level13.9288977748200521728"
+    )
+    assert cell_iri_from_id(9288977737008415701) == URIRef(
+        f"{prefix}s2.level30.9288977737008415701"
+    )
@@ -0,0 +1,77 @@
+from rdflib import RDFS, XSD, Graph, Literal, URIRef
+
+from ..src.lib.kwg_ont import KWGOnt
+from ..src.lib.s2_writer import S2Writer
+
+
+def test_streamed_triples_parse_back(tmp_path):
+    """
+    Tests that the streamed N-Triples lines form a valid turtle document
+
+    :return: None
+    """
+    destination = tmp_path / "0.ttl"
+    triple = (
+        URIRef("http://example.org/feature"),
+        KWGOnt.sfContains,
+        URIRef("http://stko-kwg.geog.ucsb.edu/lod/resource/s2.level1.1"),
+    )
+    with S2Writer(destination, "ttl") as writer:
+        writer.add(triple)
+    graph = Graph().parse(destination, format="ttl")
+    assert set(graph) == {triple}
+
+
+def test_no_file_without_triples(tmp_path):
+    """
+    Tests that features without relations don't leave empty files behind
+
+    :return: None
+    """
+    destination = tmp_path / "0.ttl"
+    with S2Writer(destination, "ttl"):
+        pass
+    assert not destination.exists()
+
+
+def test_add_all_matches_add(tmp_path):
+    """
+    Tests that writing triples in bulk produces the same graph as one by one
+
+    :return: None
+    """
+    triples = [
+        (
+            URIRef("http://example.org/feature"),
+            KWGOnt.sfOverlaps,
+            URIRef(f"http://stko-kwg.geog.ucsb.edu/lod/resource/s2.level1.{i}"),
+        )
+        for i in range(3)
+    ]
+    with S2Writer(tmp_path / "one.nt", "nt") as writer:
+        for triple in triples:
+            writer.add(triple)
+    with S2Writer(tmp_path / "all.nt", "nt") as writer:
+        writer.add_all(iter(triples))
+    assert (tmp_path / "one.nt").read_bytes() == (tmp_path / "all.nt").read_bytes()
+
+
+def test_turtle_uses_prefixed_names(tmp_path):
+    """
+    Tests that turtle files are written with prefixed names and parse back
+    to the same triples, including IRIs that can't be shortened
+
+    :return: None
+    """
+    cell_iri = URIRef("http://stko-kwg.geog.ucsb.edu/lod/resource/s2.level1.1")
+    triples = {
+        (cell_iri, KWGOnt.cellID, Literal(1, datatype=XSD.integer)),
+        (cell_iri, RDFS.label, Literal("S2 Cell", datatype=XSD.string)),
+        (URIRef("http://example.org/feature/"), KWGOnt.sfContains, cell_iri),
+    }
+    destination = tmp_path / "0.ttl"
+    with S2Writer(destination, "ttl") as writer:
+        writer.add_all(iter(triples))
+    assert b"kwgr:s2.level1.1 " in destination.read_bytes()
+    graph = Graph().parse(destination, format="ttl")
+    assert set(graph) == triples